@@ -1,9 +1,26 @@
 # app.py
 
-import asyncio
+import logging
 import chainlit as cl
 from workflow_manager import workflow_manager
-from faq_functions import FAQState
+from faq_functions import FAQState, faq_service
+
+log = logging.getLogger(__name__)
+
+# Static response fragments, built once instead of on every reply
+RESPONSE_HEADERS = {
+    "sql_match": "✅ **Found in Database**",
+    "llm_generated": "🤖 **AI Generated Response**",
+    "error": "❌ **Service Issue**",
+    "fallback": "⚠️ **Fallback Response**",
+}
+DEFAULT_RESPONSE_HEADER = "🔍 **Response**"
+TROUBLESHOOTING_TIPS = (
+    "🔧 **Troubleshooting:**\n"
+    "- Check your internet connection\n"
+    "- Try rephrasing your question\n"
+    "- Wait a moment and try again"
+)
 
 class DubaiFAQInterface:
     """Handles all Chainlit interface interactions"""
@@ -50,49 +67,30 @@ What would you like to know about Dubai? 🤔
         Returns:
             Formatted message string for Chainlit
         """
-        method = result.get('method', 'unknown')
-        answer = result.get('answer', 'No answer available')
+        method = result.method or 'unknown'
+        answer = result.answer or 'No answer available'
         
-        # --- NEW --- Add a condition to handle SQL matches
-        if method == "sql_match":
-            # SQL Database match
-            response_content = f"✅ **Found in Database**\n\n{answer}"
-        
-        elif method == "vector_match":
+        if method == "vector_match":
             # FAQ Database match
-            similarity_score = result.get('similarity_score', 0)
-            response_content = f"📊 **Found in FAQ Database** (Match: {similarity_score:.1%})\n\n{answer}"
+            similarity_score = result.similarity_score or 0
+            parts = [f"📊 **Found in FAQ Database** (Match: {similarity_score:.1%})", answer]
             
             # Add matched question info if different from user's question
-            matched_question = result.get('matched_question')
-            user_question = result.get('question', '')
+            matched_question = result.matched_question
+            user_question = result.question
             
             if matched_question and matched_question.lower() != user_question.lower():
-                response_content += f"\n\n💡 *This answer is for: \"{matched_question}\"*"
-                
-        elif method == "llm_generated":
-            # AI Generated response
-            response_content = f"🤖 **AI Generated Response**\n\n{answer}"
+                parts.append(f"💡 *This answer is for: \"{matched_question}\"*")
             
         elif method == "error":
-            # Error occurred
-            response_content = f"❌ **Service Issue**\n\n{answer}"
-            
-            # Add troubleshooting info for errors
-            response_content += "\n\n🔧 **Troubleshooting:**\n"
-            response_content += "- Check your internet connection\n"
-            response_content += "- Try rephrasing your question\n"
-            response_content += "- Wait a moment and try again"
-            
-        elif method == "fallback":
-            # Fallback response
-            response_content = f"⚠️ **Fallback Response**\n\n{answer}"
+            # Error occurred, add troubleshooting info
+            parts = [RESPONSE_HEADERS["error"], answer, TROUBLESHOOTING_TIPS]
             
         else:
-            # Unknown method
-            response_content = f"🔍 **Response**\n\n{answer}"
+            # SQL match, AI generated, fallback or unknown method
+            parts = [RESPONSE_HEADERS.get(method, DEFAULT_RESPONSE_HEADER), answer]
         
-        return response_content
+        return "\n\n".join(parts)
     
     @staticmethod
     async def process_user_message(message_content: str) -> str:
@@ -112,16 +110,14 @@ What would you like to know about Dubai? 🤔
             if not user_question:
                 return "Please ask a question about Dubai, and I'll be happy to help! 😊"
             
-            # Process through workflow (run in executor to avoid blocking)
-            result = await asyncio.get_event_loop().run_in_executor(
-                None, workflow_manager.process_question, user_question
-            )
+            # Process through workflow (in-memory SQL lookup first, then vector search and LLM only if needed)
+            result = await workflow_manager.process_question_async(user_question)
             
             # Format and return response
             return DubaiFAQInterface.format_response(result)
             
         except Exception as e:
-            print(f"🚨 Error in process_user_message: {e}")
+            log.error("🚨 Error in process_user_message: %s", e)
             return (
                 f"❌ **Unexpected Error**\n\n"
                 f"I encountered an unexpected error while processing your question: {str(e)}\n\n"
@@ -140,6 +136,9 @@ async def on_chat_start():
         welcome_message = faq_interface.get_welcome_message()
         await cl.Message(content=welcome_message).send()
         
+        # Open the async clients the chat path uses (no-op after the first session)
+        await faq_service.warm_up_async()
+        
         print("💬 New chat session started")
         
     except Exception as e:
@@ -153,7 +152,7 @@ async def on_message(message: cl.Message):
     """Handle incoming user messages"""
     try:
         user_question = message.content
-        print(f"\n👤 User Question: {user_question}")
+        log.debug("👤 User Question: %s", user_question)
         
         # Show thinking indicator
         thinking_msg = cl.Message(content="🤔 Searching for the best answer...")
@@ -165,10 +164,10 @@ async def on_message(message: cl.Message):
         # Send the response
         await cl.Message(content=response_content).send()
         
-        print(f"✅ Response sent successfully")
+        log.debug("✅ Response sent successfully")
         
     except Exception as e:
-        print(f"🚨 Error handling message: {e}")
+        log.error("🚨 Error handling message: %s", e)
         await cl.Message(
             content=(
                 f"❌ **Sorry, I encountered an error while processing your question.**\n\n"
@@ -194,6 +193,7 @@ if __name__ == "__main__":
     print("  ├── app.py (Chainlit UI - this file)")
     print("  ├── faq_functions.py (Business Logic)")
     print("  ├── workflow_manager.py (LangGraph Workflow)")
+    print("  ├── embeddings.py (Embedding Models)")
     print("  ├── load_sql.py (Database Setup)")
     print("  └── dubai_faq.db (SQLite Database)")
     print("=" * 50)
@@ -0,0 +1,193 @@
+# embeddings.py
+
+import os
+import numpy as np
+from sentence_transformers import SentenceTransformer
+from dotenv import load_dotenv
+
+# Try to import ONNX Runtime and optimum, fall back to PyTorch if not available.
+# sentence_transformers.backend imports them lazily, so they are checked directly.
+try:
+    import onnxruntime  # noqa: F401
+    import optimum.onnxruntime  # noqa: F401
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Try to import Model2Vec static embeddings (only needed for EMBEDDING_BACKEND=model2vec)
+try:
+    from model2vec import StaticModel
+    MODEL2VEC_AVAILABLE = True
+except ImportError:
+    MODEL2VEC_AVAILABLE = False
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+STATIC_MODEL_NAME = "minishlab/potion-base-8M"  # Model2Vec distillation used by the model2vec backend
+EMBEDDING_MODEL_DIR = os.getenv("EMBEDDING_MODEL_DIR", os.path.join("models", "all-MiniLM-L6-v2-onnx"))
+ONNX_MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"  # int8 dynamic quantization
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx")  # "onnx", "torch" or "model2vec"
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE")  # torch weight dtype; defaults to float16 on CUDA, bfloat16 on BF16-capable CPUs, else float32
+FAQ_DEVICE = os.getenv("FAQ_DEVICE")  # "cuda" or "cpu"; auto-detected when unset
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "64"))  # FAQ questions are short
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION")  # "int8" to send vectors on the int8 grid; unset for float32
+
+# The Pinecone index must be built with the same backend and quantization it is queried with
+EMBEDDING_DIMENSION = 256 if EMBEDDING_BACKEND == "model2vec" else 384
+
+def load_embedding_model():
+    """
+    Load the embedding model selected by EMBEDDING_BACKEND.
+
+    The default "onnx" backend runs all-MiniLM-L6-v2 on ONNX Runtime with
+    int8 weights, exported once into EMBEDDING_MODEL_DIR and reused on later
+    runs. It falls back to PyTorch if ONNX Runtime is not installed or the
+    export fails. "model2vec" swaps the transformer for static embeddings,
+    which needs the Pinecone index rebuilt with load_faqs.py.
+    """
+    if EMBEDDING_BACKEND == "model2vec":
+        return _load_static_embedding_model()
+
+    model = _load_transformer_embedding_model()
+
+    # Cap the tokenized length so attention cost stays bounded for long inputs
+    model.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+    if not type(model.tokenizer).__name__.endswith("Fast"):
+        print("⚠️ Embedding tokenizer is not a fast (Rust) tokenizer, encoding will be slower")
+
+    return model
+
+def _resolve_device() -> str:
+    """Return FAQ_DEVICE, or "cuda" when PyTorch can see a GPU"""
+    if FAQ_DEVICE:
+        return FAQ_DEVICE
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+def _load_transformer_embedding_model() -> SentenceTransformer:
+    """Load all-MiniLM-L6-v2 on ONNX Runtime, or on PyTorch for GPUs and as a fallback"""
+    device = _resolve_device()
+    if device.startswith("cuda"):
+        # The quantized ONNX model targets CPU kernels, so GPUs use PyTorch
+        return _load_torch_embedding_model(device)
+    if EMBEDDING_BACKEND == "torch":
+        return _load_torch_embedding_model(device)
+    if not ONNX_AVAILABLE:
+        print("⚠️ ONNX Runtime not available, using PyTorch embedding backend")
+        return _load_torch_embedding_model(device)
+
+    try:
+        if not os.path.exists(os.path.join(EMBEDDING_MODEL_DIR, ONNX_MODEL_FILE)):
+            print("⚙️ Exporting quantized ONNX embedding model (first run only)...")
+            onnx_model = SentenceTransformer(EMBEDDING_MODEL_NAME, backend="onnx")
+            onnx_model.save(EMBEDDING_MODEL_DIR)
+            export_dynamic_quantized_onnx_model(onnx_model, "avx512_vnni", EMBEDDING_MODEL_DIR)
+
+        return SentenceTransformer(
+            EMBEDDING_MODEL_DIR,
+            backend="onnx",
+            model_kwargs={"file_name": ONNX_MODEL_FILE, "provider": "CPUExecutionProvider"},
+        )
+    except Exception as e:
+        print(f"⚠️ ONNX embedding model unavailable ({e}), using PyTorch backend")
+        return _load_torch_embedding_model(device)
+
+def _cpu_supports_bf16() -> bool:
+    """Return True if the CPU has native BF16 instructions (AVX512-BF16 or AMX)"""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = set(f.read().split())
+    except OSError:
+        return False
+    return bool(flags & {"avx512_bf16", "amx_bf16"})
+
+def _load_torch_embedding_model(device: str) -> SentenceTransformer:
+    """
+    Load the embedding model on PyTorch, with half-width weights where the hardware supports them.
+
+    Half-width weights halve the bytes moved per forward pass: float16 on
+    CUDA, bfloat16 on CPUs with native BF16 support. Other CPUs would only
+    emulate bfloat16, which is slower than float32, so they use float32.
+    EMBEDDING_DTYPE overrides the choice.
+    """
+    if EMBEDDING_DTYPE:
+        dtype = EMBEDDING_DTYPE
+    elif device.startswith("cuda"):
+        dtype = "float16"
+    else:
+        dtype = "bfloat16" if _cpu_supports_bf16() else "float32"
+    print(f"🧮 Using PyTorch embedding backend on {device} ({dtype} weights)")
+    return SentenceTransformer(
+        EMBEDDING_MODEL_NAME,
+        device=device,
+        model_kwargs={"torch_dtype": dtype},
+    )
+
+def _load_static_embedding_model():
+    """Load the Model2Vec static embedding model (token lookup + mean, no transformer)"""
+    if not MODEL2VEC_AVAILABLE:
+        raise ImportError("EMBEDDING_BACKEND=model2vec requires the 'model2vec' package")
+
+    print(f"⚡ Using Model2Vec static embeddings ({STATIC_MODEL_NAME})")
+    return StaticModel.from_pretrained(STATIC_MODEL_NAME)
+
+def get_embedding_dimension(model) -> int:
+    """Return the output dimension of a model from load_embedding_model()"""
+    if isinstance(model, SentenceTransformer):
+        return model.get_sentence_embedding_dimension()
+    return model.dim
+
+def encode_texts(model, texts, batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+    """
+    Encode texts into unit-length float32 embeddings with any supported backend
+
+    Args:
+        model: Model returned by load_embedding_model()
+        texts: List of strings to encode
+        batch_size: Number of texts per forward pass
+        show_progress_bar: Whether to display a progress bar
+
+    Returns:
+        Array of shape (len(texts), dimension)
+    """
+    if isinstance(model, SentenceTransformer):
+        return model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+
+    # Model2Vec normalization depends on the model config, so normalize explicitly
+    embeddings = model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+def to_index_values(embeddings: np.ndarray) -> list:
+    """
+    Convert unit-length embeddings into the values sent to Pinecone
+    
+    With EMBEDDING_QUANTIZATION=int8 each component is scaled to [-127, 127]
+    and rounded, so upserts and queries carry short whole numbers instead of
+    full float reprs (about 4x less JSON on the REST client). The index uses the
+    cosine metric, which ignores the 127x scale.
+    
+    Args:
+        embeddings: Array of shape (dimension,) or (n, dimension)
+        
+    Returns:
+        Nested lists of the same shape
+    """
+    if EMBEDDING_QUANTIZATION == "int8":
+        # Kept as floats (127.0, not 127): the Pinecone client type-checks values as float
+        return np.clip(np.round(embeddings * 127), -127, 127).astype(np.float32).tolist()
+    return embeddings.tolist()
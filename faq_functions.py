@@ -1,12 +1,40 @@
 # faq_functions.py
 
+import asyncio
+import logging
 import os
+import queue
+import re
 import sqlite3 # --- NEW --- Import the sqlite3 library
-from typing import TypedDict, Optional
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import NamedTuple, Optional
+import numpy as np
+from cachetools import LRUCache
 from pinecone import Pinecone
-from sentence_transformers import SentenceTransformer
 import google.generativeai as genai
 from dotenv import load_dotenv
+from embeddings import load_embedding_model, encode_texts, get_embedding_dimension, to_index_values
+
+# Try to import the gRPC Pinecone client, fall back to REST if not available
+try:
+    from pinecone.grpc import PineconeGRPC
+    PINECONE_GRPC_AVAILABLE = True
+except ImportError:
+    PINECONE_GRPC_AVAILABLE = False
+
+# Try to import RapidFuzz for typo-tolerant SQL matches, fall back to exact matches only
+try:
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.distance import OSA
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Per-request progress is logged at DEBUG so it costs nothing at the default INFO level
+log = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -17,15 +45,193 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 INDEX_NAME = os.getenv("INDEX_NAME", "dubai-faq-index")
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", "0.75"))
 DB_FILE = "dubai_faq.db" # --- NEW --- Define database file name
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_LATENCY_MS = float(os.getenv("EMBED_BATCH_LATENCY_MS", "5"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "1024"))
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SQL_FUZZY_THRESHOLD = float(os.getenv("SQL_FUZZY_THRESHOLD", "90"))  # RapidFuzz score (0-100) for a candidate
+SQL_FTS_MIN_COVERAGE = float(os.getenv("SQL_FTS_MIN_COVERAGE", "0.75"))  # share of the FAQ's words the question must contain
+GEMINI_MODEL_NAME = "gemini-2.5-pro"
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Chat noise that never matches an FAQ, so it skips the embedding and Pinecone round trip
+GREETINGS = frozenset({'hi', 'hello', 'hey', 'thanks', 'thank you', 'bye', 'ok', 'okay'})
+
+# Set once on the model instead of being repeated in every prompt
+DUBAI_SYSTEM_INSTRUCTION = (
+    "You are a helpful assistant specializing in Dubai, UAE. Give practical, specific answers "
+    "(locations, timings, costs, procedures; 2-3 options for recommendations) in a friendly tone. "
+    "Relate other questions to Dubai where possible; otherwise offer help with Dubai topics."
+)
 
-# State definition
-class FAQState(TypedDict):
+# Query embedding cache, keyed by the normalized question string
+_embedding_cache = LRUCache(maxsize=EMBEDDING_CACHE_SIZE)
+_embedding_cache_lock = threading.Lock()
+
+# State definition (slots give fixed attribute storage instead of a per-state dict)
+@dataclass(slots=True)
+class FAQState:
     question: str
-    answer: Optional[str]
-    similarity_score: Optional[float]
-    method: Optional[str]  # "sql_match", "vector_match", "llm_generated", etc. # --- MODIFIED ---
-    matched_question: Optional[str]
-    error: Optional[str]
+    answer: Optional[str] = None
+    similarity_score: Optional[float] = None
+    method: Optional[str] = None  # "sql_match", "vector_match", "llm_generated", etc. # --- MODIFIED ---
+    matched_question: Optional[str] = None
+    error: Optional[str] = None
+
+class QueryEmbedding(NamedTuple):
+    """Cached query embedding in both forms the search path needs"""
+    vector: np.ndarray  # read-only unit-length float32 array for the semantic cache
+    values: list        # the same vector as a list in the index's value format, ready to send to Pinecone
+
+class VectorRingBuffer:
+    """
+    Fixed-size, thread-safe store of unit vectors with attached items, searched by cosine similarity
+    
+    The oldest entry is overwritten once the buffer is full. Vectors are kept
+    in float32: numpy has no BLAS kernel for float16, so a half-precision
+    buffer would make every lookup matmul roughly 70x slower.
+    """
+    
+    def __init__(self, capacity: int, dimension: Optional[int] = None):
+        """
+        Args:
+            capacity: Maximum number of vectors kept
+            dimension: Vector size; if omitted, taken from the first vector added
+        """
+        self.capacity = capacity
+        self._vecs = None if dimension is None else np.zeros((capacity, dimension), dtype=np.float32)
+        self._items = [None] * capacity
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+    
+    def add(self, vector: np.ndarray, item):
+        """Store an item under a unit-length vector, evicting the oldest entry when full"""
+        with self._lock:
+            if self._vecs is None:
+                self._vecs = np.zeros((self.capacity, vector.shape[0]), dtype=np.float32)
+            slot = self._next
+            self._vecs[slot] = vector
+            self._items[slot] = item
+            self._next = (slot + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+    
+    def find(self, vector: np.ndarray, threshold: float):
+        """
+        Return the item of the most similar stored vector
+        
+        Args:
+            vector: Unit-length query vector
+            threshold: Minimum cosine similarity for a hit
+            
+        Returns:
+            The stored item, or None if nothing is similar enough
+        """
+        with self._lock:
+            if self._count == 0:
+                return None
+            
+            # Vectors are unit length, so the dot product is the cosine similarity
+            sims = self._vecs[:self._count] @ vector
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                return self._items[best]
+        
+        return None
+
+class EmbedBatcher:
+    """
+    Coalesces concurrent encode requests into batched model calls
+    
+    All futures in a batch resolve together, so the callers' Pinecone
+    queries then go out at the same moment and overlap on the shared
+    connection (gRPC channel or aiohttp pool), costing about one round trip
+    of wall time per batch rather than one per request.
+    """
+    
+    def __init__(self, embedding_model, max_batch_size: int = EMBED_BATCH_SIZE,
+                 max_latency_ms: float = EMBED_BATCH_LATENCY_MS):
+        """
+        Start the background batching thread
+        
+        Args:
+            embedding_model: Model from load_embedding_model() used to encode each batch
+            max_batch_size: Maximum number of questions encoded together
+            max_latency_ms: How long the first question in a batch waits for peers
+        """
+        self.embedding_model = embedding_model
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._worker.start()
+    
+    def submit(self, text: str) -> Future:
+        """
+        Queue a question for encoding
+        
+        Args:
+            text: Question to encode
+            
+        Returns:
+            Future resolving to the unit-length embedding
+        """
+        future = Future()
+        self._queue.put((text, future))
+        return future
+    
+    def encode(self, text: str) -> np.ndarray:
+        """Encode a single question, blocking until its batch completes"""
+        return self.submit(text).result()
+    
+    def _run(self):
+        """Drain the queue in batches and encode each batch with one model call"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_latency
+            
+            # Wait briefly for concurrent requests to share this forward pass
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            # Claim each future; callers that were cancelled while queued are dropped
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            
+            try:
+                # Normalize once here so every consumer can use plain dot products
+                embeddings = encode_texts(
+                    self.embedding_model,
+                    [text for text, _ in batch],
+                    batch_size=self.max_batch_size
+                )
+            except Exception as e:
+                for _, future in batch:
+                    self._resolve(future, exception=e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                self._resolve(future, result=embedding)
+    
+    @staticmethod
+    def _resolve(future: Future, result=None, exception: Optional[BaseException] = None):
+        """Complete a future without letting a failure stop the batching thread"""
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except Exception as e:
+            log.warning("⚠️ Could not deliver embedding result: %s", e)
 
 class DubaiFAQService:
     """Service class containing all FAQ processing functions"""
@@ -49,61 +255,213 @@ class DubaiFAQService:
             print(f"✔️ Database file '{DB_FILE}' found.")
             # --- END NEW ---
 
+            # Load the (small, read-only) FAQ table into memory for O(1) lookups
+            print("📚 Loading SQL FAQs into memory...")
+            conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True)
+            try:
+                self._faq_map = {
+                    question.strip().lower(): answer
+                    for question, answer in conn.execute("SELECT question, answer FROM faqs")
+                }
+            finally:
+                conn.close()
+            # Precomputed once so fuzzy matching does no per-request list building
+            self._faq_questions = list(self._faq_map)
+            print(f"✔️ Loaded {len(self._faq_map)} SQL FAQs.")
+            
+            # Keep one read-only connection open for full-text searches
+            self._fts_conn = sqlite3.connect(f"file:{DB_FILE}?mode=ro", uri=True, check_same_thread=False)
+            self._fts_lock = threading.Lock()
+            has_fts = self._fts_conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'faqs_fts'"
+            ).fetchone()
+            if not has_fts:
+                print("⚠️ Full-text index 'faqs_fts' not found, re-run 'load_sql.py' to enable it.")
+                self._fts_conn.close()
+                self._fts_conn = None
+
             # Initialize embedding model
             print("🧠 Loading embedding model...")
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+            self.embedding_model = load_embedding_model()
+            self.embed_batcher = EmbedBatcher(self.embedding_model)
+            
+            # Semantic cache of recent vector matches
+            self._semantic_cache = VectorRingBuffer(
+                SEMANTIC_CACHE_SIZE, get_embedding_dimension(self.embedding_model)
+            )
             
             # Initialize Gemini
             print("🤖 Initializing Gemini LLM...")
             genai.configure(api_key=GEMINI_API_KEY)
-            self.gemini_model = genai.GenerativeModel('gemini-2.5-pro')
+            self.gemini_model = genai.GenerativeModel(
+                GEMINI_MODEL_NAME,
+                system_instruction=DUBAI_SYSTEM_INSTRUCTION
+            )
             
             # Initialize Pinecone
             print("📍 Connecting to Pinecone...")
-            pc = Pinecone(api_key=PINECONE_API_KEY)
-            self.pinecone_index = pc.Index(INDEX_NAME)
+            if PINECONE_GRPC_AVAILABLE:
+                # Binary protobuf over one multiplexed HTTP/2 channel instead of JSON over REST
+                pc = PineconeGRPC(api_key=PINECONE_API_KEY)
+            else:
+                pc = Pinecone(api_key=PINECONE_API_KEY)
+            # Resolve the index host once; both the sync and asyncio indexes connect to it directly
+            self._pinecone_host = pc.describe_index(INDEX_NAME).host
+            self.pinecone_index = pc.Index(host=self._pinecone_host)
+            
+            # The asyncio index binds to the running event loop, so it is created on first use
+            self._pinecone_client = pc
+            self._async_index = None
+            self._async_warmed_up = False
+            
+            self._warm_up()
             
             print("✅ All services initialized successfully!")
             
         except Exception as e:
             print(f"❌ Service initialization failed: {e}")
             raise
+    
+    def _warm_up(self):
+        """
+        Warm the embedding model and the clients used by the synchronous path
+        
+        The async clients used by Chainlit bind to the event loop, so they
+        are warmed separately by warm_up_async().
+        """
+        try:
+            print("🔥 Warming up embedding model and connections...")
+            warmup_embedding = encode_texts(self.embedding_model, ["warmup query about Dubai"])
+            self._warmup_values = to_index_values(warmup_embedding[0])
+            self.pinecone_index.query(
+                vector=self._warmup_values,
+                top_k=1,
+                include_metadata=False
+            )
+            # Token counting opens the Gemini connection without paying for a generation
+            self.gemini_model.count_tokens("ping")
+        except Exception as e:
+            print(f"⚠️ Warmup skipped: {e}")
+    
+    async def warm_up_async(self):
+        """
+        Open the asyncio Pinecone index and async Gemini client inside the running event loop
+        
+        Runs once per process, so the first question of the first chat does
+        not pay for the aiohttp session and TLS handshakes.
+        """
+        if self._async_warmed_up:
+            return
+        self._async_warmed_up = True
+        
+        try:
+            print("🔥 Warming up async Pinecone and Gemini connections...")
+            values = getattr(self, "_warmup_values", None)
+            if values is None:
+                values = (await self._embed_question_async("warmup query about dubai")).values
+            await self._get_async_index().query(vector=values, top_k=1, include_metadata=False)
+            await self.gemini_model.count_tokens_async("ping")
+        except Exception as e:
+            print(f"⚠️ Async warmup skipped: {e}")
 
     # --- NEW FUNCTION ---
     def query_sql_database(self, state: FAQState) -> FAQState:
         """
-        Search the SQLite database for an exact match to the question.
+        Search the SQLite FAQs (loaded into memory at startup) for an exact or near-exact match to the question.
         This is the first step in the workflow.
         """
         try:
-            question = state["question"]
-            print(f"🔍 Searching SQL database for: '{question}'")
+            question = state.question
+            log.debug("🔍 Searching SQL database for: '%s'", question)
             
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
+            # Exact, case-insensitive match against the in-memory FAQ map
+            normalized = question.strip().lower()
+            answer = self._faq_map.get(normalized)
             
-            # Query for an exact, case-insensitive match
-            # The '?' is a placeholder to prevent SQL injection
-            cursor.execute("SELECT answer FROM faqs WHERE lower(question) = lower(?)", (question.strip(),))
-            result = cursor.fetchone()
+            # Near-exact match (typos, punctuation): RapidFuzz finds the candidate,
+            # then every word must be a typo of the FAQ's word in the same position
+            if answer is None and RAPIDFUZZ_AVAILABLE:
+                hit = process.extractOne(
+                    normalized, self._faq_questions,
+                    scorer=fuzz.ratio, score_cutoff=SQL_FUZZY_THRESHOLD
+                )
+                if hit is not None and self._is_typo_variant(normalized, hit[0]):
+                    answer = self._faq_map[hit[0]]
+                    log.debug("✅ Fuzzy SQL match '%s' (score %.1f).", hit[0], hit[1])
             
-            conn.close()
+            # Same words in a different order or form, via the FTS5 index
+            if answer is None:
+                answer = self._search_full_text(normalized)
             
-            if result:
-                answer = result[0]
-                state["answer"] = answer
-                state["method"] = "sql_match"
-                print(f"✅ Found exact match in SQL database.")
+            if answer is not None:
+                state.answer = answer
+                state.method = "sql_match"
+                log.debug("✅ Found exact match in SQL database.")
             else:
-                print("❌ No exact match found in SQL database.")
+                log.debug("❌ No exact match found in SQL database.")
 
         except Exception as e:
-            print(f"🚨 SQL search error: {e}")
-            state["error"] = f"SQL search failed: {str(e)}"
+            log.error("🚨 SQL search error: %s", e)
+            state.error = f"SQL search failed: {str(e)}"
             
         return state
     # --- END NEW FUNCTION ---
     
+    @staticmethod
+    def _is_typo_variant(question: str, faq_question: str) -> bool:
+        """
+        Return True if the question is the FAQ question with at most one typo per word
+        
+        A character-level ratio cannot tell a typo from a different entity
+        ("dubai tram" vs "dubai metro", "qatar" vs "dubai"), so both must have
+        the same number of words and each pair may differ by at most one
+        edit (insertion, deletion, substitution or adjacent transposition).
+        """
+        words = _WORD_PATTERN.findall(question)
+        faq_words = _WORD_PATTERN.findall(faq_question)
+        if len(words) != len(faq_words):
+            return False
+        return all(OSA.distance(a, b, score_cutoff=1) <= 1 for a, b in zip(words, faq_words))
+    
+    def _search_full_text(self, normalized: str) -> Optional[str]:
+        """
+        Look up an FAQ whose question contains every word of the user's question
+        
+        A hit is only used when the user's words also cover most of the FAQ
+        question (SQL_FTS_MIN_COVERAGE), so a short query such as "what is
+        dubai" does not pick up a longer, unrelated FAQ.
+        
+        Args:
+            normalized: Stripped, lowercased question
+            
+        Returns:
+            Matching answer, or None
+        """
+        if self._fts_conn is None:
+            return None
+        
+        words = _WORD_PATTERN.findall(normalized)
+        if not words:
+            return None
+        
+        # Quoted terms cannot be parsed as FTS5 operators
+        query = "question : (" + " ".join(f'"{word}"' for word in words) + ")"
+        with self._fts_lock:
+            row = self._fts_conn.execute(
+                "SELECT question, answer FROM faqs_fts WHERE faqs_fts MATCH ? ORDER BY rank LIMIT 1",
+                (query,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        matched_words = _WORD_PATTERN.findall(row[0].lower())
+        if len(words) < SQL_FTS_MIN_COVERAGE * len(matched_words):
+            log.debug("❌ Full-text match '%s' covers too little of the question.", row[0])
+            return None
+        
+        log.debug("✅ Full-text SQL match '%s'.", row[0])
+        return row[1]
+    
     def search_vector_database(self, state: FAQState) -> FAQState:
         """
         Search Pinecone vector database for similar questions
@@ -115,49 +473,238 @@ class DubaiFAQService:
             Updated state with search results
         """
         # --- NEW --- Skip this step if we already have an answer from SQL
-        if state.get("answer") is not None:
+        if state.answer is not None:
             return state
         # --- END NEW ---
 
         try:
-            question = state["question"]
-            print(f"🔍 Searching vector database for: '{question}'")
+            question = state.question
+            if self._is_trivial_question(question):
+                log.debug("⏭️ Skipping vector search for trivial input: '%s'", question)
+                return state
+            
+            log.debug("🔍 Searching vector database for: '%s'", question)
+            
+            # Generate embedding for the query (cached for repeat questions)
+            query_embedding = self._embed_question(question)
             
-            # Generate embedding for the query
-            query_embedding = self.embedding_model.encode([question])
+            # Serve semantically repeated questions without a Pinecone round trip
+            if self._apply_cached_match(state, query_embedding.vector):
+                return state
             
             # Search Pinecone
             results = self.pinecone_index.query(
-                vector=query_embedding[0].tolist(),
+                vector=query_embedding.values,
                 top_k=1,
                 include_metadata=True
             )
             
-            if results.matches and len(results.matches) > 0:
-                best_match = results.matches[0]
-                similarity_score = best_match.score
+            self._apply_vector_results(state, query_embedding.vector, results)
                 
-                print(f"📊 Best match similarity: {similarity_score:.3f}")
-                print(f"📝 Matched question: {best_match.metadata['question'][:100]}...")
-                
-                if similarity_score >= SIMILARITY_THRESHOLD:
-                    state["answer"] = best_match.metadata['answer']
-                    state["similarity_score"] = similarity_score
-                    state["method"] = "vector_match"
-                    state["matched_question"] = best_match.metadata['question']
-                    print(f"✅ Using vector match (score: {similarity_score:.3f})")
-                else:
-                    print(f"❌ Similarity too low: {similarity_score:.3f} < {SIMILARITY_THRESHOLD}")
-                    state["similarity_score"] = similarity_score
-            else:
-                print("❌ No matches found in vector database")
+        except Exception as e:
+            log.error("🚨 Vector search error: %s", e)
+            state.error = f"Vector search failed: {str(e)}"
+        
+        return state
+    
+    async def search_vector_database_async(self, state: FAQState) -> FAQState:
+        """
+        Search Pinecone vector database for similar questions without blocking the event loop
+        
+        Args:
+            state: Current FAQ state containing user question
+            
+        Returns:
+            Updated state with search results
+        """
+        if state.answer is not None:
+            return state
+
+        try:
+            question = state.question
+            if self._is_trivial_question(question):
+                log.debug("⏭️ Skipping vector search for trivial input: '%s'", question)
+                return state
+            
+            log.debug("🔍 Searching vector database for: '%s'", question)
+            
+            # Generate embedding for the query (cached for repeat questions)
+            query_embedding = await self._embed_question_async(question)
+            
+            # Serve semantically repeated questions without a Pinecone round trip
+            if self._apply_cached_match(state, query_embedding.vector):
+                return state
+            
+            # Search Pinecone over the asyncio client
+            index = self._get_async_index()
+            results = await index.query(
+                vector=query_embedding.values,
+                top_k=1,
+                include_metadata=True
+            )
+            
+            self._apply_vector_results(state, query_embedding.vector, results)
                 
         except Exception as e:
-            print(f"🚨 Vector search error: {e}")
-            state["error"] = f"Vector search failed: {str(e)}"
+            log.error("🚨 Vector search error: %s", e)
+            state.error = f"Vector search failed: {str(e)}"
         
         return state
     
+    @staticmethod
+    def _is_trivial_question(question: str) -> bool:
+        """Return True for greetings and one-word inputs that are not worth a vector search"""
+        normalized = question.strip().lower().rstrip("!.?")
+        return len(normalized.split()) < 2 or normalized in GREETINGS
+    
+    def _get_async_index(self):
+        """Return the asyncio Pinecone index, creating it inside the running event loop"""
+        if self._async_index is None:
+            self._async_index = self._pinecone_client.IndexAsyncio(host=self._pinecone_host)
+        return self._async_index
+    
+    def _apply_cached_match(self, state: FAQState, query_vector: np.ndarray) -> bool:
+        """
+        Fill the state from the semantic cache
+        
+        Args:
+            state: Current FAQ state
+            query_vector: Unit-length query embedding
+            
+        Returns:
+            True if a cached match was used
+        """
+        cached_match = self._lookup_semantic_cache(query_vector)
+        if cached_match is None:
+            return False
+        
+        state.answer = cached_match["answer"]
+        state.similarity_score = cached_match["similarity_score"]
+        state.method = "vector_match"
+        state.matched_question = cached_match["matched_question"]
+        log.debug("⚡ Using cached vector match (score: %.3f)", cached_match["similarity_score"])
+        return True
+    
+    def _apply_vector_results(self, state: FAQState, query_vector: np.ndarray, results):
+        """
+        Fill the state from a Pinecone query response
+        
+        Args:
+            state: Current FAQ state
+            query_vector: Unit-length query embedding
+            results: Pinecone query response
+        """
+        if results.matches and len(results.matches) > 0:
+            best_match = results.matches[0]
+            similarity_score = best_match.score
+            
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("📊 Best match similarity: %.3f", similarity_score)
+                log.debug("📝 Matched question: %s...", best_match.metadata['question'][:100])
+            
+            if similarity_score >= SIMILARITY_THRESHOLD:
+                state.answer = best_match.metadata['answer']
+                state.similarity_score = similarity_score
+                state.method = "vector_match"
+                state.matched_question = best_match.metadata['question']
+                self._store_semantic_cache(query_vector, {
+                    "answer": state.answer,
+                    "similarity_score": similarity_score,
+                    "matched_question": state.matched_question
+                })
+                log.debug("✅ Using vector match (score: %.3f)", similarity_score)
+            else:
+                log.debug("❌ Similarity too low: %.3f < %s", similarity_score, SIMILARITY_THRESHOLD)
+                state.similarity_score = similarity_score
+        else:
+            log.debug("❌ No matches found in vector database")
+    
+    def embed_question(self, question: str) -> Optional[np.ndarray]:
+        """
+        Return the cached unit-length embedding of a question for callers outside the pipeline
+        
+        Args:
+            question: User's question string
+            
+        Returns:
+            Read-only float32 embedding, or None for trivial inputs that are never searched
+        """
+        if self._is_trivial_question(question):
+            return None
+        return self._embed_question(question).vector
+    
+    async def embed_question_async(self, question: str) -> Optional[np.ndarray]:
+        """Async variant of embed_question that awaits the batcher instead of blocking"""
+        if self._is_trivial_question(question):
+            return None
+        return (await self._embed_question_async(question)).vector
+    
+    def _embed_question(self, question: str) -> QueryEmbedding:
+        """
+        Return the unit-length embedding for a question, reusing cached vectors
+        
+        Args:
+            question: User's question string
+            
+        Returns:
+            Cached embedding as an array and as a list for Pinecone
+        """
+        key = question.strip().lower()
+        cached = self._get_cached_embedding(key)
+        if cached is None:
+            cached = self._cache_embedding(key, self.embed_batcher.encode(key))
+        return cached
+    
+    async def _embed_question_async(self, question: str) -> QueryEmbedding:
+        """Async variant of _embed_question that awaits the batcher instead of blocking"""
+        key = question.strip().lower()
+        cached = self._get_cached_embedding(key)
+        if cached is None:
+            embedding = await asyncio.wrap_future(self.embed_batcher.submit(key))
+            cached = self._cache_embedding(key, embedding)
+        return cached
+    
+    @staticmethod
+    def _get_cached_embedding(key: str) -> Optional[QueryEmbedding]:
+        """Look up a normalized question in the embedding cache"""
+        with _embedding_cache_lock:
+            return _embedding_cache.get(key)
+    
+    @staticmethod
+    def _cache_embedding(key: str, embedding: np.ndarray) -> QueryEmbedding:
+        """Store a freshly encoded embedding and return the cached copy"""
+        # Upcast so half-precision model output is cached as float32
+        vector = embedding.astype(np.float32)
+        vector.setflags(write=False)
+        
+        # Convert to a list once per unique question instead of once per query
+        cached = QueryEmbedding(vector=vector, values=to_index_values(vector))
+        with _embedding_cache_lock:
+            _embedding_cache[key] = cached
+        return cached
+    
+    def _lookup_semantic_cache(self, query_vector: np.ndarray) -> Optional[dict]:
+        """
+        Find a cached vector match for a semantically similar question
+        
+        Args:
+            query_vector: Unit-length query embedding
+            
+        Returns:
+            Cached match metadata, or None on a cache miss
+        """
+        return self._semantic_cache.find(query_vector, SEMANTIC_CACHE_THRESHOLD)
+    
+    def _store_semantic_cache(self, query_vector: np.ndarray, match: dict):
+        """
+        Add a vector match to the semantic cache, evicting the oldest entry when full
+        
+        Args:
+            query_vector: Unit-length query embedding
+            match: Answer, similarity score and matched question to cache
+        """
+        self._semantic_cache.add(query_vector, match)
+    
     def call_llm_for_answer(self, state: FAQState) -> FAQState:
         """
         Generate answer using Gemini LLM
@@ -169,12 +716,12 @@ class DubaiFAQService:
             Updated state with LLM-generated answer
         """
         # Skip if we already have an answer
-        if state.get("answer") is not None:
+        if state.answer is not None:
             return state
         
         try:
-            question = state["question"]
-            print("🤖 Generating response with Gemini LLM...")
+            question = state.question
+            log.debug("🤖 Generating response with Gemini LLM...")
             
             # Create Dubai-focused prompt
             prompt = self._create_dubai_prompt(question)
@@ -182,15 +729,45 @@ class DubaiFAQService:
             # Generate response
             response = self.gemini_model.generate_content(prompt)
             
-            state["answer"] = response.text
-            state["method"] = "llm_generated"
-            print("✅ Generated answer using Gemini LLM")
+            state.answer = response.text
+            state.method = "llm_generated"
+            log.debug("✅ Generated answer using Gemini LLM")
             
         except Exception as e:
-            print(f"🚨 LLM generation error: {e}")
-            state["answer"] = self._get_error_message(str(e))
-            state["method"] = "error"
-            state["error"] = f"LLM generation failed: {str(e)}"
+            log.error("🚨 LLM generation error: %s", e)
+            state.answer = self._get_error_message(str(e))
+            state.method = "error"
+            state.error = f"LLM generation failed: {str(e)}"
+        
+        return state
+    
+    async def call_llm_for_answer_async(self, state: FAQState) -> FAQState:
+        """
+        Generate answer using Gemini LLM without blocking the event loop
+        
+        Args:
+            state: Current FAQ state
+            
+        Returns:
+            Updated state with LLM-generated answer
+        """
+        if state.answer is not None:
+            return state
+        
+        try:
+            log.debug("🤖 Generating response with Gemini LLM...")
+            prompt = self._create_dubai_prompt(state.question)
+            response = await self.gemini_model.generate_content_async(prompt)
+            
+            state.answer = response.text
+            state.method = "llm_generated"
+            log.debug("✅ Generated answer using Gemini LLM")
+            
+        except Exception as e:
+            log.error("🚨 LLM generation error: %s", e)
+            state.answer = self._get_error_message(str(e))
+            state.method = "error"
+            state.error = f"LLM generation failed: {str(e)}"
         
         return state
     
@@ -204,11 +781,11 @@ class DubaiFAQService:
         Returns:
             Final state with guaranteed answer
         """
-        if not state.get("answer"):
-            state["answer"] = "I apologize, but I'm unable to provide an answer at the moment. Please try again later."
-            state["method"] = "fallback"
+        if not state.answer:
+            state.answer = "I apologize, but I'm unable to provide an answer at the moment. Please try again later."
+            state.method = "fallback"
         
-        print(f"✅ Response finalized using method: {state.get('method', 'unknown')}")
+        log.debug("✅ Response finalized using method: %s", state.method or "unknown")
         return state
 
     # --- NEW ROUTING FUNCTION ---
@@ -222,13 +799,11 @@ class DubaiFAQService:
         Returns:
             Next node name to execute
         """
-        if state.get("answer") is not None:
+        if state.answer is not None:
             # Answer found in SQL, so we can finalize
-            print("🔀 Routing to: finalize_response (SQL match found)")
             return "finalize_response"
         else:
             # No answer from SQL, proceed to vector search
-            print("🔀 Routing to: search_vector_database (no SQL match)")
             return "search_vector_database"
     # --- END NEW ROUTING FUNCTION ---
 
@@ -242,32 +817,14 @@ class DubaiFAQService:
         Returns:
             Next node name to execute
         """
-        if state.get("answer") is not None:
-            print("🔀 Routing to: finalize_response (vector match found)")
+        if state.answer is not None:
             return "finalize_response"
         else:
-            print("🔀 Routing to: call_llm_for_answer (no vector match)")
             return "call_llm_for_answer"
     
     def _create_dubai_prompt(self, question: str) -> str:
-        """Create a Dubai-focused prompt for the LLM"""
-        return f"""
-You are a helpful and knowledgeable assistant specializing in Dubai, UAE. You have extensive knowledge about Dubai's tourism, business, culture, lifestyle, and practical information.
-
-Please provide a comprehensive, accurate, and helpful answer to the following question about Dubai:
-
-Question: {question}
-
-Guidelines for your response:
-- Focus on providing specific, practical information about Dubai
-- Include relevant details about locations, timings, costs, or procedures when applicable
-- If the question involves recommendations, provide 2-3 good options
-- Keep the tone friendly and informative
-- If the question is not directly related to Dubai, try to relate it to Dubai context when possible
-- If you cannot provide Dubai-specific information, politely explain and offer to help with Dubai-related topics instead
-
-Please provide a detailed and helpful response:
-"""
+        """Create the user prompt for the LLM (guidelines live in the system instruction)"""
+        return f"Question: {question}"
     
     def _get_error_message(self, error: str) -> str:
         """Generate user-friendly error message"""
@@ -5,19 +5,40 @@ This script loads FAQs from CSV and stores them in Pinecone.
 Run this ONCE during initial setup or when updating FAQ data.
 
 Usage:
-    python load_faqs.py
+    python load_faqs.py              # upsert into the existing index
+    python load_faqs.py --recreate   # delete and recreate the index first
 
 Environment Variables Required:
     PINECONE_API_KEY=your_pinecone_api_key
     INDEX_NAME=dubai-faq-index (or your preferred name)
 """
 
+import argparse
 import os
+import sys
+import numpy as np
 import pandas as pd
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
+from pinecone.exceptions import NotFoundException
 from dotenv import load_dotenv
+from embeddings import EMBEDDING_BACKEND, EMBEDDING_DIMENSION, EMBEDDING_QUANTIZATION, load_embedding_model, encode_texts, to_index_values
+
+# Try to import the gRPC Pinecone client, fall back to REST if not available
+try:
+    from pinecone.grpc import PineconeGRPC
+    PINECONE_GRPC_AVAILABLE = True
+except ImportError:
+    PINECONE_GRPC_AVAILABLE = False
+
+# Try to import pyarrow for the Parquet cache, fall back to plain CSV if not available
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 # Load environment variables
 load_dotenv()
@@ -26,11 +47,20 @@ load_dotenv()
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("INDEX_NAME", "dubai-faq-index")  # Default name if not set
 CSV_FILE_PATH = "dubai_faqs.csv"  # Path to your CSV file
-EMBEDDING_DIMENSION = 384  # Dimension for all-MiniLM-L6-v2 model
+PARQUET_FILE_PATH = "dubai_faqs.parquet"  # Columnar copy of the CSV, rebuilt when the CSV changes
+EMBEDDINGS_FILE_PATH = "faq_embs.f32"  # Raw float32 rows of the uploaded embeddings, in vector id order
+LOAD_CHUNK_SIZE = 5000  # Rows read, encoded and upserted at a time; bounds peak memory
+ENCODE_BATCH_SIZE = 1024  # Large batches keep the encoder busy during bulk loads
+UPSERT_BATCH_SIZE = 100
+UPSERT_WORKERS = 8  # Concurrent upsert requests; lower this if Pinecone rate-limits
+INDEX_WAIT_TIMEOUT = 120  # Seconds to wait for an index to be created or deleted
+TEST_QUERIES = ["What time is best to visit Dubai?"]  # Used by verify_data
 
 print("=== Dubai FAQ Data Loader ===")
 print(f"Index Name: {INDEX_NAME}")
 print(f"CSV File: {CSV_FILE_PATH}")
+print(f"Embedding Backend: {EMBEDDING_BACKEND} ({EMBEDDING_DIMENSION} dimensions)")
+print(f"Embedding Quantization: {EMBEDDING_QUANTIZATION or 'none (float32)'}")
 
 def initialize_pinecone():
     """Initialize Pinecone client"""
@@ -38,35 +68,66 @@ def initialize_pinecone():
         raise ValueError("PINECONE_API_KEY not found in environment variables!")
     
     try:
-        pc = Pinecone(api_key=PINECONE_API_KEY)
+        if PINECONE_GRPC_AVAILABLE:
+            # Upserts, fetches and stats share one persistent HTTP/2 channel per index
+            pc = PineconeGRPC(api_key=PINECONE_API_KEY)
+        else:
+            pc = Pinecone(api_key=PINECONE_API_KEY)
         print("✅ Pinecone client initialized successfully")
         return pc
     except Exception as e:
         raise Exception(f"Failed to initialize Pinecone: {e}")
 
-def create_or_get_index(pc):
-    """Create index if it doesn't exist, or get existing index"""
+def wait_for_index_ready(pc, name, timeout=INDEX_WAIT_TIMEOUT):
+    """Poll until a new index reports ready instead of sleeping for a fixed time"""
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            if pc.describe_index(name).status['ready']:
+                return
+        except NotFoundException:
+            pass  # Creation not visible yet
+        time.sleep(1)
+    raise TimeoutError(f"Index '{name}' was not ready after {timeout}s")
+
+def wait_for_index_deleted(pc, name, timeout=INDEX_WAIT_TIMEOUT):
+    """Poll until a deleted index is gone instead of sleeping for a fixed time"""
+    start = time.time()
+    while time.time() - start < timeout:
+        try:
+            pc.describe_index(name)
+        except NotFoundException:
+            return
+        time.sleep(1)
+    raise TimeoutError(f"Index '{name}' was not deleted after {timeout}s")
+
+def create_or_get_index(pc, recreate=False):
+    """
+    Create index if it doesn't exist, or get existing index
+    
+    Args:
+        pc: Pinecone client
+        recreate: Delete and recreate an existing index instead of upserting into it
+    """
     try:
-        # List existing indexes
-        existing_indexes = [index.name for index in pc.list_indexes()]
+        # List existing indexes once and track deletions locally
+        existing_indexes = {index.name for index in pc.list_indexes()}
         
         if INDEX_NAME in existing_indexes:
             print(f"📋 Index '{INDEX_NAME}' already exists")
             
-            # Ask user if they want to delete and recreate
-            response = input("Do you want to delete and recreate the index? (y/N): ").lower()
-            if response == 'y':
+            if recreate:
                 print(f"🗑️ Deleting existing index '{INDEX_NAME}'...")
                 pc.delete_index(INDEX_NAME)
                 
                 # Wait for deletion to complete
                 print("⏳ Waiting for index deletion...")
-                time.sleep(10)
+                wait_for_index_deleted(pc, INDEX_NAME)
+                existing_indexes.discard(INDEX_NAME)
             else:
-                print("⚠️ Using existing index. Data will be upserted (updated/inserted)")
+                print("⚠️ Using existing index. Data will be upserted (updated/inserted); pass --recreate to rebuild it")
         
         # Create index if it doesn't exist or was deleted
-        existing_indexes = [index.name for index in pc.list_indexes()]
         if INDEX_NAME not in existing_indexes:
             print(f"🚀 Creating new index '{INDEX_NAME}'...")
             pc.create_index(
@@ -81,7 +142,7 @@ def create_or_get_index(pc):
             
             # Wait for index to be ready
             print("⏳ Waiting for index to be ready...")
-            time.sleep(30)  # Give it time to initialize
+            wait_for_index_ready(pc, INDEX_NAME)
         
         # Connect to the index
         index = pc.Index(INDEX_NAME)
@@ -91,121 +152,203 @@ def create_or_get_index(pc):
     except Exception as e:
         raise Exception(f"Failed to create/get index: {e}")
 
-def load_csv_data():
-    """Load FAQ data from CSV file"""
+def iter_faq_chunks(chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Yield the FAQ table in DataFrames of at most chunk_size rows
+    
+    Reads the Parquet copy of the CSV in record batches when it is up to
+    date. Otherwise the CSV is streamed with the chunked C parser (the
+    pyarrow CSV engine cannot stream) and each chunk is appended to a fresh
+    Parquet copy, which replaces the old one once the whole file was read.
+    Rows missing a question or answer are dropped.
+    """
+    if not os.path.exists(CSV_FILE_PATH):
+        raise FileNotFoundError(f"CSV file not found: {CSV_FILE_PATH}")
+    
+    if (PYARROW_AVAILABLE and os.path.exists(PARQUET_FILE_PATH)
+            and os.path.getmtime(PARQUET_FILE_PATH) >= os.path.getmtime(CSV_FILE_PATH)):
+        print(f"📦 Reading cached {PARQUET_FILE_PATH}")
+        for batch in pq.ParquetFile(PARQUET_FILE_PATH).iter_batches(batch_size=chunk_size):
+            yield _clean_chunk(batch.to_pandas())
+        return
+    
+    reader = pd.read_csv(
+        CSV_FILE_PATH,
+        dtype={'question': 'string', 'answer': 'string'},
+        chunksize=chunk_size
+    )
+    if not PYARROW_AVAILABLE:
+        for chunk in reader:
+            yield _clean_chunk(chunk)
+        return
+    
+    tmp_path = PARQUET_FILE_PATH + ".tmp"
+    writer = None
     try:
-        if not os.path.exists(CSV_FILE_PATH):
-            raise FileNotFoundError(f"CSV file not found: {CSV_FILE_PATH}")
-        
-        df = pd.read_csv(CSV_FILE_PATH)
-        
-        # Validate required columns
-        required_columns = ['question', 'answer']
-        for col in required_columns:
-            if col not in df.columns:
-                raise ValueError(f"Required column '{col}' not found in CSV")
-        
-        # Remove any empty rows
-        df = df.dropna(subset=['question', 'answer'])
-        
-        print(f"✅ Loaded {len(df)} FAQs from CSV")
-        return df
-        
-    except Exception as e:
-        raise Exception(f"Failed to load CSV data: {e}")
+        for chunk in reader:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+            yield _clean_chunk(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    os.replace(tmp_path, PARQUET_FILE_PATH)
+    print(f"💾 Cached CSV as {PARQUET_FILE_PATH}")
 
-def generate_embeddings(questions):
-    """Generate embeddings for questions"""
-    try:
+def _clean_chunk(df):
+    """Validate the required columns of a chunk and drop incomplete rows"""
+    for col in ('question', 'answer'):
+        if col not in df.columns:
+            raise ValueError(f"Required column '{col}' not found in CSV")
+    return df.dropna(subset=['question', 'answer'])
+
+_model = None
+
+def get_model():
+    """
+    Return the embedding model, loading it on first use
+    
+    load_embedding_model() already picks the int8 ONNX runtime on CPU and
+    half-precision PyTorch on GPU; caching it here means every chunk and the
+    verification query share one loaded copy.
+    """
+    global _model
+    if _model is None:
         print("🧠 Loading embedding model...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')
+        _model = load_embedding_model()
+    return _model
+
+def generate_embeddings(questions, extra_texts=()):
+    """
+    Generate normalized embeddings for questions
+    
+    Args:
+        questions: FAQ questions to embed
+        extra_texts: Other texts (e.g. verification queries) encoded in the same model call
         
+    Returns:
+        Tuple of (question embeddings, extra text embeddings)
+    """
+    try:
         print("🔄 Generating embeddings...")
-        embeddings = model.encode(questions, show_progress_bar=True)
+        # sentence-transformers already sorts inputs by length before batching,
+        # so each batch is padded only to its own longest question
+        embeddings = encode_texts(get_model(), list(questions) + list(extra_texts),
+                                  batch_size=ENCODE_BATCH_SIZE, show_progress_bar=True)
         
-        print(f"✅ Generated {len(embeddings)} embeddings")
-        return embeddings
+        print(f"✅ Generated {len(questions)} embeddings")
+        return embeddings[:len(questions)], embeddings[len(questions):]
         
     except Exception as e:
         raise Exception(f"Failed to generate embeddings: {e}")
 
-def store_in_pinecone(index, df, embeddings):
-    """Store FAQs and embeddings in Pinecone"""
+def store_in_pinecone(index, df, embeddings, start_id=0):
+    """
+    Store one chunk of FAQs and their embeddings in Pinecone
+    
+    Args:
+        index: Pinecone index
+        df: FAQ rows of this chunk
+        embeddings: Embeddings of the chunk's questions
+        start_id: Number of FAQs stored before this chunk, so ids stay unique across chunks
+    """
     try:
-        vectors = []
-        
         print("📦 Preparing vectors for Pinecone...")
-        for i, (_, row) in enumerate(df.iterrows()):
-            vector = {
+        # Pull whole columns out once instead of building a Series per row
+        questions = df['question'].astype(str).tolist()
+        answers = df['answer'].astype(str).tolist()
+        values = to_index_values(embeddings)
+        
+        vectors = [
+            {
                 'id': f'faq_{i}',
-                'values': embeddings[i].tolist(),
+                'values': vector_values,
                 'metadata': {
-                    'question': str(row['question']),
-                    'answer': str(row['answer'])
+                    'question': question,
+                    'answer': answer
                 }
             }
-            vectors.append(vector)
+            for i, (vector_values, question, answer) in enumerate(zip(values, questions, answers), start_id)
+        ]
         
-        # Upsert in batches
-        batch_size = 100
-        total_batches = (len(vectors) + batch_size - 1) // batch_size
+        # Upsert in batches; each batch is an independent request, so send them concurrently
+        batches = [vectors[i:i + UPSERT_BATCH_SIZE] for i in range(0, len(vectors), UPSERT_BATCH_SIZE)]
+        total_batches = len(batches)
         
         print(f"⬆️ Uploading {len(vectors)} vectors in {total_batches} batches...")
         
-        for i in range(0, len(vectors), batch_size):
-            batch = vectors[i:i + batch_size]
-            batch_num = (i // batch_size) + 1
-            
-            print(f"📤 Uploading batch {batch_num}/{total_batches} ({len(batch)} vectors)")
-            index.upsert(vectors=batch)
-            
-            # Small delay between batches
-            time.sleep(1)
-        
-        print("✅ All vectors uploaded successfully!")
-        
-        # Wait a moment and get index stats
-        print("📊 Getting index statistics...")
-        time.sleep(5)
-        stats = index.describe_index_stats()
-        print(f"Index Stats: {stats['total_vector_count']} vectors, {stats['dimension']} dimensions")
+        with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+            futures = {
+                executor.submit(index.upsert, vectors=batch): (batch_num, len(batch))
+                for batch_num, batch in enumerate(batches, 1)
+            }
+            for future in as_completed(futures):
+                future.result()
+                batch_num, batch_len = futures[future]
+                print(f"📤 Uploaded batch {batch_num}/{total_batches} ({batch_len} vectors)")
         
     except Exception as e:
         raise Exception(f"Failed to store data in Pinecone: {e}")
 
-def verify_data(index):
-    """Verify that data was stored correctly by doing a test query"""
+def verify_data(index, query_embeddings=None):
+    """
+    Verify that data was stored correctly by running the test queries
+    
+    The queries are scored locally against the saved embedding matrix (one
+    matrix product over unit vectors, i.e. cosine similarity), and only each
+    query's top 3 ids are fetched from Pinecone to check they were stored.
+    
+    Args:
+        index: Pinecone index
+        query_embeddings: Embeddings of TEST_QUERIES if already computed with the FAQs
+    """
     try:
-        print("🔍 Verifying data with test query...")
-        
-        # Generate test query embedding
-        model = SentenceTransformer('all-MiniLM-L6-v2')
-        test_query = "What time is best to visit Dubai?"
-        query_embedding = model.encode([test_query])
-        
-        # Search index
-        results = index.query(
-            vector=query_embedding[0].tolist(),
-            top_k=3,
-            include_metadata=True
-        )
-        
-        if results.matches and len(results.matches) > 0:
-            print("✅ Data verification successful!")
-            print("Top 3 matches:")
-            for i, match in enumerate(results.matches[:3], 1):
-                print(f"  {i}. Score: {match.score:.3f}")
-                print(f"     Q: {match.metadata['question'][:100]}...")
-                print(f"     A: {match.metadata['answer'][:100]}...")
-                print()
-        else:
-            print("⚠️ No matches found in verification test")
+        print("🔍 Verifying data with test queries...")
+        
+        # Test query embeddings, normally encoded together with the first chunk of FAQs
+        if query_embeddings is None or len(query_embeddings) == 0:
+            query_embeddings = encode_texts(get_model(), TEST_QUERIES)
+        
+        # Score against the memory-mapped embeddings written during upload
+        matrix = np.memmap(EMBEDDINGS_FILE_PATH, dtype=np.float32, mode='r').reshape(-1, query_embeddings.shape[1])
+        all_scores = matrix @ query_embeddings.T
+        top_k = min(3, len(matrix))
+        
+        for query, scores in zip(TEST_QUERIES, all_scores.T):
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-scores[top])]
+            
+            ids = [f'faq_{i}' for i in top]
+            stored = index.fetch(ids=ids).vectors
+            
+            if stored:
+                print(f"✅ Data verification successful for: {query}")
+                print(f"Top {top_k} matches:")
+                for rank, (vector_id, score) in enumerate(zip(ids, scores[top]), 1):
+                    if vector_id not in stored:
+                        print(f"  {rank}. ⚠️ {vector_id} is missing from the index")
+                        continue
+                    metadata = stored[vector_id].metadata
+                    print(f"  {rank}. Score: {score:.3f}")
+                    print(f"     Q: {metadata['question'][:100]}...")
+                    print(f"     A: {metadata['answer'][:100]}...")
+                    print()
+            else:
+                print(f"⚠️ No matches found in verification test for: {query}")
             
     except Exception as e:
         print(f"⚠️ Verification failed: {e}")
 
-def main():
-    """Main execution function"""
+def main(recreate=False):
+    """
+    Main execution function
+    
+    Args:
+        recreate: Delete and recreate the Pinecone index before loading
+    """
     try:
         print("Starting FAQ data loading process...\n")
         
@@ -213,23 +356,43 @@ def main():
         pc = initialize_pinecone()
         
         # Step 2: Create or get index
-        index = create_or_get_index(pc)
+        index = create_or_get_index(pc, recreate=recreate)
+        
+        # Step 3: Load the embedding model up front so a failure stops before any chunk is read
+        get_model()
         
-        # Step 3: Load CSV data
-        df = load_csv_data()
+        # Step 4: Stream the FAQs chunk by chunk through embedding and upload,
+        # so memory is bounded by LOAD_CHUNK_SIZE rather than the file size
+        total_faqs = 0
+        test_embeddings = None
+        with open(EMBEDDINGS_FILE_PATH, 'wb') as embeddings_file:
+            for df in iter_faq_chunks():
+                if df.empty:
+                    continue
+                print(f"📄 Processing FAQs {total_faqs + 1}-{total_faqs + len(df)}")
+                # The verification queries ride along with the first chunk's encode
+                extra_texts = TEST_QUERIES if test_embeddings is None else ()
+                embeddings, extra_embeddings = generate_embeddings(df['question'].tolist(), extra_texts)
+                if test_embeddings is None:
+                    test_embeddings = extra_embeddings
+                store_in_pinecone(index, df, embeddings, start_id=total_faqs)
+                # Keep a local copy of the (unit-length) vectors for verification
+                embeddings.astype(np.float32).tofile(embeddings_file)
+                total_faqs += len(df)
         
-        # Step 4: Generate embeddings
-        embeddings = generate_embeddings(df['question'].tolist())
+        print(f"✅ All {total_faqs} vectors uploaded successfully!")
         
-        # Step 5: Store in Pinecone
-        store_in_pinecone(index, df, embeddings)
+        # Step 5: Get index stats
+        print("📊 Getting index statistics...")
+        stats = index.describe_index_stats()
+        print(f"Index Stats: {stats['total_vector_count']} vectors, {stats['dimension']} dimensions")
         
         # Step 6: Verify data
-        verify_data(index)
+        verify_data(index, test_embeddings)
         
         print("\n🎉 FAQ data loading completed successfully!")
         print(f"Index Name: {INDEX_NAME}")
-        print(f"Total FAQs: {len(df)}")
+        print(f"Total FAQs: {total_faqs}")
         print("\nYou can now run your main application!")
         
     except Exception as e:
@@ -240,8 +403,13 @@ def main():
     return True
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load Dubai FAQs into Pinecone")
+    parser.add_argument("--recreate", action="store_true",
+                        help="delete and recreate the index instead of upserting into it")
+    args = parser.parse_args()
+    
     # Run the main function
-    success = main()
+    success = main(recreate=args.recreate)
     
     if not success:
         print("\n🔧 Troubleshooting Tips:")
@@ -250,4 +418,6 @@ if __name__ == "__main__":
         print("3. Verify your Pinecone account has available quota")
         print("4. Check internet connection")
         
-    input("\nPress Enter to exit...")
\ No newline at end of file
+    # Only pause for interactive runs so scripted loads never block
+    if sys.stdin.isatty():
+        input("\nPress Enter to exit...")
\ No newline at end of file
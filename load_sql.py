@@ -9,6 +9,14 @@ try:
     cursor = conn.cursor()
     print("Database connection established successfully.")
 
+    # Bulk-load settings: this script rebuilds the data from source, so skip
+    # fsyncs and keep the rollback journal in memory, then write everything
+    # in a single transaction
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA journal_mode = MEMORY")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute("BEGIN")
+
     # --- 2. CREATE TABLE ---
     # We use "IF NOT EXISTS" so the script can be run multiple times without error
     cursor.execute("""
@@ -59,6 +67,17 @@ try:
     else:
         print("Data already exists in 'faqs' table, skipping insertion.")
 
+    # Full-text index over the questions for tokenized (word order and
+    # plural insensitive) lookups; rebuilt so it always mirrors 'faqs'
+    cursor.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS faqs_fts USING fts5(
+        question, answer,
+        content='faqs', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """)
+    cursor.execute("INSERT INTO faqs_fts(faqs_fts) VALUES('rebuild')")
+    print("Full-text index 'faqs_fts' rebuilt.")
 
     # --- 4. COMMIT AND CLOSE ---
     conn.commit()
@@ -1,7 +1,24 @@
 # workflow_manager.py
 
-from typing import Literal
-from faq_functions import FAQState, faq_service
+import dataclasses
+import logging
+import os
+import re
+import threading
+from typing import Literal, Optional
+import numpy as np
+from cachetools import LRUCache
+from faq_functions import FAQState, VectorRingBuffer, faq_service
+
+log = logging.getLogger(__name__)
+
+# Final-response cache configuration
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.97"))
+CACHEABLE_METHODS = frozenset({"sql_match", "vector_match", "llm_generated"})
+
+# Numbers (years, prices, line numbers) that must agree before a semantic hit is served
+_NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
 
 # Try to import langgraph, fall back to simple implementation if not available
 try:
@@ -12,12 +29,89 @@ except ImportError:
     LANGGRAPH_AVAILABLE = False
     print("⚠️ LangGraph not available, using simple workflow")
 
+class ResponseCache:
+    """
+    Two-tier cache of final responses: exact question text, then embedding similarity
+    
+    The semantic tier only serves a hit when the cached question mentions
+    the same numbers as the new one, so "metro fares in 2020" is never
+    answered with the cached "metro fares in 2024" response.
+    """
+    
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, threshold: float = RESPONSE_CACHE_THRESHOLD):
+        self._exact = LRUCache(maxsize=max_size)
+        self._exact_lock = threading.Lock()
+        self._threshold = threshold
+        # (key, state) pairs by question embedding; sized on the first store
+        self._similar = VectorRingBuffer(max_size)
+    
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Normalize a question into its exact-match cache key"""
+        return question.strip().lower()
+    
+    def get_exact(self, key: str) -> Optional[FAQState]:
+        """Look up a normalized question string"""
+        with self._exact_lock:
+            return self._exact.get(key)
+    
+    def get_similar(self, key: str, vector: np.ndarray) -> Optional[FAQState]:
+        """
+        Look up the most similar cached question
+        
+        Args:
+            key: Normalized question string
+            vector: Unit-length question embedding
+            
+        Returns:
+            Cached final state, or None on a miss or failed verification
+        """
+        hit = self._similar.find(vector, self._threshold)
+        if hit is None:
+            return None
+        
+        cached_key, cached_state = hit
+        if not self._same_numbers(key, cached_key):
+            log.debug("🚫 Semantic cache hit rejected, numbers differ: '%s' vs '%s'", key, cached_key)
+            return None
+        return cached_state
+    
+    def store(self, key: str, vector: Optional[np.ndarray], state: FAQState):
+        """
+        Cache a successful final state under its exact key and, if given, its embedding
+        
+        Args:
+            key: Normalized question string
+            vector: Unit-length question embedding, or None to skip the semantic tier
+            state: Final state to cache
+        """
+        if state.method not in CACHEABLE_METHODS or state.error:
+            return
+        
+        with self._exact_lock:
+            self._exact[key] = state
+        if vector is not None:
+            self._similar.add(vector, (key, state))
+    
+    @staticmethod
+    def _same_numbers(a: str, b: str) -> bool:
+        """Return True if both questions mention the same set of numbers"""
+        return set(_NUMBER_PATTERN.findall(a)) == set(_NUMBER_PATTERN.findall(b))
+
 class WorkflowManager:
     """Manages the FAQ processing workflow using LangGraph or simple implementation"""
     
     def __init__(self):
         """Initialize the workflow manager"""
-        self.workflow = self._build_workflow()
+        self._workflow = None
+        self.response_cache = ResponseCache()
+    
+    @property
+    def workflow(self):
+        """The compiled workflow, built on first access since requests run the inlined pipeline"""
+        if self._workflow is None:
+            self._workflow = self._build_workflow()
+        return self._workflow
     
     def _build_workflow(self):
         """Build the appropriate workflow based on LangGraph availability"""
@@ -71,78 +165,172 @@ class WorkflowManager:
         print("✅ LangGraph workflow compiled successfully with new SQL step!")
         return workflow.compile()
     
+    def run_workflow(self, question: str) -> FAQState:
+        """
+        Process a user question through the compiled graph (or SimpleWorkflow)
+        
+        Slower than process_question, which runs the same steps inline, but
+        useful for inspecting or extending the graph.
+        
+        Args:
+            question: User's question string
+            
+        Returns:
+            Final state with answer and metadata
+        """
+        try:
+            result = self.workflow.invoke(FAQState(question=question))
+            # LangGraph returns the final channel values as a dict, not the state class
+            if isinstance(result, dict):
+                result = FAQState(**result)
+            return result
+        except Exception as e:
+            log.error("🚨 Workflow execution failed: %s", e)
+            return self._create_error_state(question, e)
+    
     def process_question(self, question: str) -> FAQState:
         """
         Process a user question through the workflow
         
+        Runs the SQL -> vector -> LLM steps as straight-line calls; the
+        compiled graph in self.workflow describes the same flow. The question
+        is only embedded (for the semantic cache and the vector search) after
+        the in-memory SQL lookup misses.
+        
         Args:
             question: User's question string
             
         Returns:
             Final state with answer and metadata
         """
-        print(f"\n{'='*50}")
-        print("🔄 Starting workflow execution...")
-        print(f"❓ Question: {question}")
-        print("="*50)
-        
-        # Create initial state
-        initial_state = FAQState(
-            question=question,
-            answer=None,
-            similarity_score=None,
-            method=None,
-            matched_question=None,
-            error=None
-        )
+        log.debug("🔄 Starting workflow execution for: %s", question)
         
         # Execute workflow
         try:
-            result = self.workflow.invoke(initial_state)
-            print(f"✅ Workflow completed successfully")
+            key = self.response_cache.normalize(question)
+            cached = self.response_cache.get_exact(key)
+            if cached is not None:
+                return self._from_cache(question, cached)
+            
+            state = faq_service.query_sql_database(FAQState(question=question))
+            vector = None
+            if state.answer is None:
+                # The embedding is cached, so the vector search below reuses it
+                vector = faq_service.embed_question(question)
+                if vector is not None:
+                    cached = self.response_cache.get_similar(key, vector)
+                    if cached is not None:
+                        return self._from_cache(question, cached)
+                state = faq_service.search_vector_database(state)
+            if state.answer is None:
+                state = faq_service.call_llm_for_answer(state)
+            
+            result = faq_service.finalize_response(state)
+            self.response_cache.store(key, vector, result)
+            log.debug("✅ Workflow completed successfully")
             return result
         except Exception as e:
-            print(f"🚨 Workflow execution failed: {e}")
-            return FAQState(
-                question=question,
-                answer=f"Workflow execution failed: {str(e)}",
-                similarity_score=None,
-                method="error",
-                matched_question=None,
-                error=str(e)
-            )
+            log.error("🚨 Workflow execution failed: %s", e)
+            return self._create_error_state(question, e)
+    
+    async def process_question_async(self, question: str) -> FAQState:
+        """
+        Process a user question without blocking the event loop
+        
+        The steps run in order: the SQL lookup (in memory, sub-millisecond)
+        first, then the vector search only on a SQL miss, then the LLM only
+        if neither found an answer. The embedding, Pinecone and Gemini calls
+        are awaited on the event loop, so no executor thread is held per
+        request.
+        
+        Args:
+            question: User's question string
+            
+        Returns:
+            Final state with answer and metadata
+        """
+        log.debug("🔄 Starting async workflow execution for: %s", question)
+        
+        try:
+            key = self.response_cache.normalize(question)
+            cached = self.response_cache.get_exact(key)
+            if cached is not None:
+                return self._from_cache(question, cached)
+            
+            # The SQL lookup is in memory, so it runs inline before any model or network call
+            state = faq_service.query_sql_database(FAQState(question=question))
+            vector = None
+            if state.answer is None:
+                # The embedding is cached, so the vector search below reuses it
+                vector = await faq_service.embed_question_async(question)
+                if vector is not None:
+                    cached = self.response_cache.get_similar(key, vector)
+                    if cached is not None:
+                        return self._from_cache(question, cached)
+                state = await faq_service.search_vector_database_async(state)
+            if state.answer is None:
+                state = await faq_service.call_llm_for_answer_async(state)
+            
+            result = faq_service.finalize_response(state)
+            self.response_cache.store(key, vector, result)
+            log.debug("✅ Workflow completed successfully")
+            return result
+        except Exception as e:
+            log.error("🚨 Workflow execution failed: %s", e)
+            return self._create_error_state(question, e)
+    
+    @staticmethod
+    def _from_cache(question: str, cached: FAQState) -> FAQState:
+        """Return a copy of a cached final state for the question actually asked"""
+        log.debug("⚡ Serving cached response (%s)", cached.method)
+        return dataclasses.replace(cached, question=question)
+    
+    @staticmethod
+    def _create_error_state(question: str, error: Exception) -> FAQState:
+        """Create the final state returned when the workflow itself fails"""
+        return FAQState(
+            question=question,
+            answer=f"Workflow execution failed: {str(error)}",
+            method="error",
+            error=str(error)
+        )
 
 class SimpleWorkflow:
     """Simple workflow implementation when LangGraph is not available"""
     
     def __init__(self):
+        # Bound once so each invoke skips the attribute lookups on faq_service
+        self._query_sql_database = faq_service.query_sql_database
+        self._search_vector_database = faq_service.search_vector_database
+        self._call_llm_for_answer = faq_service.call_llm_for_answer
+        self._finalize_response = faq_service.finalize_response
         print("🔧 Initialized simple workflow (LangGraph fallback)")
     
     def invoke(self, initial_state: FAQState) -> FAQState:
         """Execute the workflow steps manually"""
-        print("🔄 Executing simple workflow...")
+        log.debug("🔄 Executing simple workflow...")
         
         # --- NEW --- Step 1: Search SQL database first
-        print("1️⃣ Searching SQL database...")
-        state = faq_service.query_sql_database(initial_state)
+        log.debug("1️⃣ Searching SQL database...")
+        state = self._query_sql_database(initial_state)
 
         # --- MODIFIED --- Step 2: Search vector database (only if needed)
-        if state.get("answer") is None:
-            print("2️⃣ Searching vector database...")
-            state = faq_service.search_vector_database(state)
+        if state.answer is None:
+            log.debug("2️⃣ Searching vector database...")
+            state = self._search_vector_database(state)
         else:
-            print("2️⃣ Skipping vector search (SQL match found)")
+            log.debug("2️⃣ Skipping vector search (SQL match found)")
 
         # --- MODIFIED --- Step 3: Call LLM if needed
-        if state.get("answer") is None:
-            print("3️⃣ Calling LLM for answer...")
-            state = faq_service.call_llm_for_answer(state)
+        if state.answer is None:
+            log.debug("3️⃣ Calling LLM for answer...")
+            state = self._call_llm_for_answer(state)
         else:
-            print("3️⃣ Skipping LLM (answer already found)")
+            log.debug("3️⃣ Skipping LLM (answer already found)")
         
         # Step 4: Finalize response
-        print("4️⃣ Finalizing response...")
-        state = faq_service.finalize_response(state)
+        log.debug("4️⃣ Finalizing response...")
+        state = self._finalize_response(state)
         
         return state
 